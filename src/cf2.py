@@ -8,24 +8,32 @@ the system into a standardized environent.
 """
 
 from abc import ABC, abstractmethod
+import functools  # for caching kernel version and system metamodel
 import io
-import os         # for getting script directory
+import os         # for getting script directory and sysfs file I/O
 import pathlib
 import platform   # for platform.uname()
 import re         # for kernel version decoding
 import subprocess # for git
-import sys        # for stdout
-from typing import Any, IO, Optional, TextIO
+import sys        # for stdout and sys.intern
+from typing import Any, IO, KeysView, Optional, TextIO
 
 # ===[ HELPER FUNCTIONS ]===
 
-# Helper function to insert text at start of each line
+# Helper function to insert text at start of each ('\n' terminated) line
 def PrefixLines(s: str, prefix: str):
-    new_lines = [f'{prefix}{l}' for l in s.splitlines(keepends=True)]
-    return ''.join(new_lines)
+    # A single C-level replace rather than splitting into a list of lines
+    if not s:
+        return s
+    if s.endswith('\n'):
+        return prefix + s[:-1].replace('\n', '\n' + prefix) + '\n'
+    return prefix + s.replace('\n', '\n' + prefix)
 
 # === [ Helper functions for kernel version processing ]===
 
+# Version string of style: w.x.y-z(suffix) where suffix starts with - or .
+KERNEL_VERSION_REGEX = re.compile(r'([0-9]+)\.([0-9]+)\.([0-9]+)-([0-9]+)([-\.].*)?')
+
 # Using the terminology from https://askubuntu.com/a/843198:
 class KernelVersionNumber:
     w: int
@@ -33,10 +41,10 @@ class KernelVersionNumber:
     y: int
     z: int
     suffix: str
+    __slots__ = ('w', 'x', 'y', 'z', 'suffix')
 
     def __init__(self, version_string: str):
-        # Version string of style: w.x.y-z(suffix) where suffix starts with - or .
-        decoded = re.search(r'([0-9]+)\.([0-9]+)\.([0-9]+)-([0-9]+)([-\.].*)?', version_string)
+        decoded = KERNEL_VERSION_REGEX.search(version_string)
 
         if not decoded:
             raise ValueError(f'{version_string} is not a kernel version number!')
@@ -63,22 +71,29 @@ class KernelVersionNumber:
         class_name = type(self).__name__
         return f'{class_name}("{str(self)}")'
 
+# The running kernel cannot change during the lifetime of the process, so
+# uname() is only consulted (and its result parsed) once
+@functools.lru_cache(maxsize=1)
 def GetKernelVersion() -> KernelVersionNumber:
     version_str = platform.uname().release
     version = KernelVersionNumber(version_str)
     return version
 
 # ===[ PLUGS ]===
-class Plug(ABC):
-    @abstractmethod
+# Plug and MetaTreeNode are abstract by convention only: they are plain
+# classes (not ABCs) since they sit on every traversal and every read
+class Plug:
+    __slots__ = ()
+
     def Read(self):
-        pass
+        raise NotImplementedError()
 
-    @abstractmethod
     def Write(self, value):
-        pass
+        raise NotImplementedError()
 
 class KernelVersionPlug(Plug):
+    __slots__ = ()
+
     def Read(self) -> KernelVersionNumber:
         return GetKernelVersion()
 
@@ -87,91 +102,119 @@ class KernelVersionPlug(Plug):
 
 class FileStrPlug(Plug):
     __filename: pathlib.Path
+    __slots__ = ('__filename',)
 
     def __init__(self, filename: pathlib.Path):
         self.__filename = filename
     
+    # sysfs attributes are tiny (at most a page) and are produced in full by
+    # a single read(), so go through raw fds instead of the buffered/text
+    # file object stack that open() builds
+    def ReadBytes(self) -> bytes:
+        fd = os.open(self.__filename, os.O_RDONLY | os.O_CLOEXEC)
+        try:
+            return os.read(fd, 4096)
+        finally:
+            os.close(fd)
+
     def Read(self) -> str:
-        with open(self.__filename, "r") as f:
-            return f.read().rstrip()
+        return self.ReadBytes().rstrip().decode()
     
     def Write(self, value: str) -> None:
-        with open(self.__filename, "w") as f:
-            f.write(value)
+        fd = os.open(self.__filename, os.O_WRONLY | os.O_TRUNC | os.O_CLOEXEC)
+        try:
+            os.write(fd, value.encode())
+        finally:
+            os.close(fd)
 
-class ThpOptionPlug(Plug):
+# The typed file plugs below are FileStrPlugs that parse/format the raw file
+# contents themselves
+class ThpOptionPlug(FileStrPlug):
     # Handle THP option files (option selected with [])
-    __fsplug: FileStrPlug
-
-    def __init__(self, filename: pathlib.Path):
-        self.__fsplug = FileStrPlug(filename)
+    __slots__ = ()
 
     def Read(self) -> str:
-        s = self.__fsplug.Read()
-        
-        for word in s.split():
-            if word[0] == '[' and word[-1] == ']':
-                return word[1:-1]
-        
-        raise RuntimeError("error reading thp option")
-    
-    def Write(self, value: str):
-        self.__fsplug.Write(value)
+        data = self.ReadBytes()
 
-class FileIntPlug(Plug):
-    # Implement as a wrapper around FileStrPlug
-    __fsplug: FileStrPlug
+        # e.g. "always madvise [never]": slice out the bracketed word without
+        # splitting the line into a list of words first; only the selected
+        # word is ever decoded
+        start = data.find(b'[')
+        end = data.find(b']', start + 1)
+        if start == -1 or end == -1:
+            raise RuntimeError("error reading thp option")
+        return data[start + 1:end].decode()
+
+class FileIntPlug(FileStrPlug):
+    __slots__ = ()
 
-    def __init__(self, filename: pathlib.Path):
-        self.__fsplug = FileStrPlug(filename)
-    
     def Read(self) -> int:
-        return int(self.__fsplug.Read())
+        # int() parses bytes directly and ignores the trailing newline
+        return int(self.ReadBytes())
     
     def Write(self, value: int) -> None:
-        self.__fsplug.Write(str(value))
+        super().Write(str(value))
     
-class FileBoolPlug(Plug):
-    # Implement as a wrapper around FileStrPlug
-    __fsplug: FileStrPlug
+# Raw (lowercased) file contents accepted by FileBoolPlug
+FILE_BOOL_VALUES = {b'true': True, b'false': False}
+
+class FileBoolPlug(FileStrPlug):
+    __slots__ = ()
 
-    def __init__(self, filename: pathlib.Path):
-        self.__fsplug = FileStrPlug(filename)
-    
     def Read(self) -> bool:
-        s = self.__fsplug.Read()
-        if s.lower() == "true":
-            return True
-        elif s.lower() == "false":
-            return False
-        else:
+        data = self.ReadBytes().rstrip()
+        # The kernel writes these in lower case, so only fall back to
+        # lowercasing (an extra copy) when the exact lookup misses
+        value = FILE_BOOL_VALUES.get(data)
+        if value is None:
+            value = FILE_BOOL_VALUES.get(data.lower())
+        if value is None:
             raise RuntimeError("invalid/ambiguous bool value read")
+        return value
     
     def Write(self, value: bool) -> None:
         s = "true" if value else "false"
-        self.__fsplug.Write(s)
+        super().Write(s)
 
 # ===[ META TREE STRUCTURE CLASSES ]===
 
-class MetaTreeNode(ABC):
+class MetaTreeNode:
     __name: str
-    __helpstring: str
+    __full_helpstring: str # helpstring with the [Ap]/[RO] suffix
     __applyable: bool
     __parent: 'Optional[MetaTreeFixedDict]'
+    __path: tuple[str, ...]
+    __pathstr: str
 
     # The Plug logic is actually decoupled from TypeChecking; we include it
     # here for convenience but it should be thought of as being seperated from
     # the rest of the MetaTreeNode data
     __plug: Optional[Plug]
 
+    # Nodes have a fixed set of attributes, so use slots rather than a
+    # per-instance __dict__ (smaller nodes and faster attribute access)
+    __slots__ = ('__name', '__full_helpstring', '__applyable', '__parent', '__path',
+                 '__pathstr', '__plug')
+
     def __init__(self, name: str, helpstring: str, applyable: bool, **kwargs):
+        # Names are used as dict keys by every traversal; interning lets key
+        # comparisons succeed on identity
+        name = sys.intern(name)
         self.__name = name
-        self.__helpstring = helpstring
         self.__applyable = applyable
+        # The node is immutable, so the help string only needs formatting once
+        suffix = '[Ap]' if applyable else '[RO]'
+        self.__full_helpstring = f'{helpstring} {suffix}'
         self.__parent = None
         if 'parent' in kwargs:
             self.__parent = kwargs['parent']
             self.__parent.RegisterChild(self)
+        # Nodes are never re-parented, so the path can be computed once here
+        if self.__parent:
+            self.__path = (*self.__parent.Path(), name)
+        else:
+            self.__path = (name,)
+        self.__pathstr = '.'.join(self.__path)
         self.__plug = None
         if 'plug' in kwargs:
             self.__plug = kwargs['plug']
@@ -180,8 +223,7 @@ class MetaTreeNode(ABC):
         return self.__name
     
     def HelpString(self) -> str:
-        suffix = '[Ap]' if self.Applyable() else '[RO]' 
-        return (f'{self.__helpstring} {suffix}')
+        return self.__full_helpstring
 
     def Applyable(self) -> bool:
         return self.__applyable
@@ -189,25 +231,25 @@ class MetaTreeNode(ABC):
     def Parent(self) -> 'Optional[MetaTreeFixedDict]':
         return self.__parent
     
-    def Path(self) -> list[str]:
-        if self.__parent:
-            return [*self.__parent.Path(), self.Name()]
-        else:
-            return [self.Name()]
+    def Path(self) -> tuple[str, ...]:
+        return self.__path
+
+    # Path joined with '.', as used in error messages
+    def PathStr(self) -> str:
+        return self.__pathstr
 
-    @abstractmethod
     def TypeString(self) -> str:
-        pass
+        raise NotImplementedError()
 
-    @abstractmethod
     def AcceptVisitor(self, visitor: 'MetaTreeVisitor') -> None:
-        pass
+        raise NotImplementedError()
 
     def Plug(self) -> Optional[Plug]:
         return self.__plug
     
 class MetaTreeFixedDict(MetaTreeNode):
     __children: dict[str, 'MetaTreeNode']
+    __slots__ = ('__children',)
 
     def __init__(self, name: str, helpstring: str, applyable: bool, **kwargs):
         super().__init__(name, helpstring, applyable, **kwargs)
@@ -216,8 +258,8 @@ class MetaTreeFixedDict(MetaTreeNode):
     def Children(self) -> 'dict[str, MetaTreeNode]':
         return self.__children
     
-    def ChildrenNames(self) -> list[str]:
-        return list(self.__children.keys())
+    def ChildrenNames(self) -> KeysView[str]:
+        return self.__children.keys()
     
     def TypeString(self) -> str:
         return "FixedDict"
@@ -226,7 +268,10 @@ class MetaTreeFixedDict(MetaTreeNode):
         return self.__children[key]
 
     def RegisterChild(self, ch: 'MetaTreeNode'):
-        assert(ch.Name() not in self.__children)
+        # Checked even under -O: a duplicate would silently replace the
+        # existing child and leave it orphaned
+        if ch.Name() in self.__children:
+            raise ValueError(f'{self.PathStr()}: duplicate child "{ch.Name()}"')
         self.__children[ch.Name()] = ch
     
     def AcceptVisitor(self, visitor: 'MetaTreeVisitor') -> None:
@@ -234,20 +279,26 @@ class MetaTreeFixedDict(MetaTreeNode):
 
 class MetaTreeScalar(MetaTreeNode):
     __ty: type
+    __typename: str
+    __full_helpstring: str
+    __slots__ = ('__ty', '__typename', '__full_helpstring')
 
     def __init__(self, name: str, helpstring: str, applyable: bool, ty: type, **kwargs):
         super().__init__(name, helpstring, applyable, **kwargs)
         self.__ty = ty
+        # The node is immutable, so the type name and help string only need
+        # formatting once
+        self.__typename = ty.__name__
+        self.__full_helpstring = f'{super().HelpString()} [Type = {self.__typename}]'
 
     def Ty(self) -> type:
         return self.__ty
     
     def HelpString(self) -> str:
-        s = super().HelpString()
-        return f'{s} [Type = {self.Ty().__name__}]'
+        return self.__full_helpstring
     
     def TypeString(self) -> str:
-        return self.Ty().__name__
+        return self.__typename
     
     def AcceptVisitor(self, visitor: 'MetaTreeVisitor') -> None:
         return visitor.VisitScalar(self)
@@ -256,6 +307,8 @@ class MetaTreeScalar(MetaTreeNode):
 # ===[ KERNEL VERSION CUSTOM LOGIC ]===
 # Custom code to handle kernel version numbers in meta tree
 class KvnPlug(Plug):
+    __slots__ = ()
+
     def Read(self) -> dict[str, any]:
         kvn = GetKernelVersion()
         ret = {
@@ -272,6 +325,8 @@ class KvnPlug(Plug):
 
 class MetaTreeKvn(MetaTreeFixedDict):
     # Special class for handling kernel version numbers
+    __slots__ = ()
+
     def __init__(self, name: str, helpstring: str, **kwargs):
         super().__init__(name, helpstring, False, plug = KvnPlug(), **kwargs)
         MetaTreeScalar('w', 'w component of version name', False, int, parent=self)
@@ -282,167 +337,172 @@ class MetaTreeKvn(MetaTreeFixedDict):
                        False, str, parent=self)
 
 # ===[ META TREE VISITOR CLASSES ]===
-class MetaTreeVisitor(ABC):
-    @abstractmethod
+# Abstract by convention only, like Plug and MetaTreeNode: a visitor is
+# created for most traversals, so it is kept a plain class
+class MetaTreeVisitor:
+    __slots__ = ()
+
     def VisitFixedDict(self, node: MetaTreeFixedDict) -> None:
-        pass
+        raise NotImplementedError()
 
-    @abstractmethod
     def VisitScalar(self, node: MetaTreeScalar) -> None:
-        pass
+        raise NotImplementedError()
+
+# Glyphs used to draw the tree; which one is used depends only on the
+# position of a node among its siblings
+TREE_BRANCH_MID = ' ├── '
+TREE_BRANCH_LAST = ' └── '
+TREE_INDENT_MID = ' │  '
+TREE_INDENT_LAST = '    '
 
 class MetaTreePrinter(MetaTreeVisitor):
     __output: TextIO
     __is_top: bool
     __is_last_sibling: bool
+    __prefix: str # indentation inherited from the ancestors of the node
+    __slots__ = ('__output', '__is_top', '__is_last_sibling', '__prefix')
 
-    def __init__(self, output: TextIO, is_top: bool, is_last_sibling: bool):
+    def __init__(self, output: TextIO, is_top: bool, is_last_sibling: bool, prefix: str = ''):
         super().__init__()
         self.__output = output
         self.__is_top = is_top
         self.__is_last_sibling = is_last_sibling
+        self.__prefix = prefix
     
     def PrintCommon(self, node: MetaTreeNode) -> None:
         if self.__is_top:
-            print(f'{node.Name()}: {node.HelpString()}', file=self.__output)
+            branch = ''
+        elif self.__is_last_sibling:
+            branch = TREE_BRANCH_LAST
         else:
-            if self.__is_last_sibling:
-                print(f' └── {node.Name()}: {node.HelpString()}', file=self.__output)
-            else:
-                print(f' ├── {node.Name()}: {node.HelpString()}', file=self.__output)
+            branch = TREE_BRANCH_MID
+        self.__output.write(''.join([self.__prefix, branch, node.Name(), ': ', node.HelpString(), '\n']))
 
     def VisitFixedDict(self, node: MetaTreeFixedDict) -> None:
         self.PrintCommon(node)
 
-        prefix = ''
+        # Children write straight to the output with the prefix extended,
+        # so each line is written exactly once
+        prefix = self.__prefix
         if not self.__is_top:
             if self.__is_last_sibling:
-                prefix = '    '
+                prefix += TREE_INDENT_LAST
             else:
-                prefix = ' │  '
-
-        children_list = list(node.ChildrenNames())
-        for c in children_list:
-            str_io = io.StringIO()
+                prefix += TREE_INDENT_MID
 
-            if c == children_list[-1]:
-                new_visitor = MetaTreePrinter(str_io, False, True)
-            else:
-                new_visitor = MetaTreePrinter(str_io, False, False)
-        
-            node[c].AcceptVisitor(new_visitor)
-            print(PrefixLines(str_io.getvalue(), prefix), file = self.__output, end="")
+        children = node.Children()
+        last = len(children) - 1
+        for i, ch in enumerate(children.values()):
+            ch.AcceptVisitor(MetaTreePrinter(self.__output, False, i == last, prefix))
 
     def VisitScalar(self, node: MetaTreeScalar) -> None:
         self.PrintCommon(node)
 
 class MetaTreeTypeChecker(MetaTreeVisitor):
-    __data: Any
+    # One checker is used for the whole traversal; the data belonging to the
+    # node currently being visited is the top of __datastack
+    __datastack: list[Any]
     __errlist: list[str]
+    __slots__ = ('__datastack', '__errlist')
 
     def __init__(self, data: Any, errlist: list[str]):
         super().__init__()
 
-        self.__data = data
+        self.__datastack = [data]
         self.__errlist = errlist
 
     def VisitFixedDict(self, node: MetaTreeFixedDict) -> None:
-        pathstr = '.'.join(node.Path())
-
-        if type(self.__data) is not dict:
-            self.__errlist.append(f"{pathstr}: type mismatch (expected: dict got: {type(self.__data).__name__})")
+        pathstr = node.PathStr()
+        datastack = self.__datastack
+        data = datastack[-1]
+        # Bound once here rather than looked up on every loop iteration
+        err = self.__errlist.append
+
+        if type(data) is not dict:
+            err(f"{pathstr}: type mismatch (expected: dict got: {type(data).__name__})")
         else:
-            for k in self.__data:
-                if k not in node.ChildrenNames():
-                    self.__errlist.append(f"{pathstr}: \"{k}\" is not a valid key")
+            # Membership tests go straight to the dicts (O(1) each)
+            children = node.Children()
+            push = datastack.append
+            pop = datastack.pop
+            for k, v in data.items():
+                if k not in children:
+                    err(f"{pathstr}: \"{k}\" is not a valid key")
                 else:
-                    node[k].AcceptVisitor(MetaTreeTypeChecker(self.__data[k], self.__errlist))
+                    push(v)
+                    children[k].AcceptVisitor(self)
+                    pop()
 
-            for k in node.ChildrenNames():
-                if k not in self.__data:
-                    typetext = node[k].TypeString()
-                    self.__errlist.append(f"{pathstr}: missing \"{k}\" field [Type = {typetext}]")
+            for k, ch in children.items():
+                if k not in data:
+                    typetext = ch.TypeString()
+                    err(f"{pathstr}: missing \"{k}\" field [Type = {typetext}]")
     
     def VisitScalar(self, node: MetaTreeScalar) -> None:
-        pathstr = '.'.join(node.Path())
+        pathstr = node.PathStr()
+        data = self.__datastack[-1]
 
-        if type(self.__data) != node.Ty():
-            self.__errlist.append(f"{pathstr}: type mismatch (expected: {node.TypeString()} got: {type(self.__data).__name__})")
+        # Exact type match (so a bool is not accepted as an int); `is` makes
+        # this a plain identity check on the type objects
+        if type(data) is not node.Ty():
+            self.__errlist.append(f"{pathstr}: type mismatch (expected: {node.TypeString()} got: {type(data).__name__})")
 
 # ===[ SYSTEM SETTING COMMUNICATION ]===
-class MetaTreePlugReaderVisitor(MetaTreeVisitor):
-    __rawdata: dict[str, Any]
 
-    def __init__(self, rawdata: Any):
+# Collects every node whose value is obtained through a plug, without doing
+# any I/O. Reading the system is then split into two steps: gather the plugs,
+# then read them all in one place (see ReadPlugs).
+class MetaTreePlugCollectorVisitor(MetaTreeVisitor):
+    __nodes: list[MetaTreeNode]
+    __slots__ = ('__nodes',)
+
+    def __init__(self, nodes: list[MetaTreeNode]):
         super().__init__()
-        self.__rawdata = rawdata
+        self.__nodes = nodes
 
     def VisitFixedDict(self, node: MetaTreeFixedDict) -> None:
         # Some FixedDict nodes might have a custom plug
         if node.Plug() is not None:
-            p = node.Plug()
-            self.__rawdata[node.Name()] = p.Read()
-        # ... otherwise run the child plugs elementwise
+            self.__nodes.append(node)
+        # ... otherwise collect the child plugs elementwise. The collector
+        # carries no per-node state, so the same instance visits every child
         else:
-            x = self.__rawdata[node.Name()] = {}
-            for ch in node.Children():
-                node[ch].AcceptVisitor(MetaTreePlugReaderVisitor(x))
+            for ch in node.Children().values():
+                ch.AcceptVisitor(self)
 
     def VisitScalar(self, node: MetaTreeScalar) -> None:
-        p = node.Plug()
-        assert(p is not None)
-        self.__rawdata[node.Name()] = p.Read()
-
-class MetaTreePlugWriterVisitor(MetaTreeVisitor):
-    __diffonly: bool
-    __rawdata: Any
-    __errlist: list[str]
-
-    def __init__(self, diffonly: bool, rawdata: Any, errlist: list[str]):
-        self.__diffonly = diffonly
-        self.__rawdata = rawdata
-        self.__errlist = errlist
-
-    def __TryWriteIfNeeded(self, node: MetaTreeNode, p: Plug) -> Optional[str]:
-        # Returns none if success, or an error string if an error
-        if self.__diffonly or not node.Applyable():
-            # If diffonly, only perform a write if value different from current
-            val = p.Read()
-            if val == self.__rawdata:
-                return None
-            elif not node.Applyable():
-                return f'{".".join(node.Path())}: difference in non-applyable value (desired = {self.__rawdata} actual = {val})'
-
+        assert(node.Plug() is not None)
+        self.__nodes.append(node)
+
+def ReadPlugs(plugs: list[Plug], jobs: int = 1) -> list[Any]:
+    # All system reads for a config go through here. Values are returned in
+    # the order given; with jobs > 1 the reads themselves are issued from a
+    # thread pool so that their kernel-side latencies overlap (the GIL is
+    # released during the syscalls)
+    if jobs <= 1:
+        return [p.Read() for p in plugs]
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(lambda p: p.Read(), plugs))
+
+def WritePlugs(writes: list[tuple[MetaTreeNode, Any]]) -> list[str]:
+    # All system writes for a config go through here, in the order given.
+    # Returns list of errors (empty if none)
+    errlist = []
+    for node, value in writes:
         try:
-            p.Write(self.__rawdata)
-            return None
+            node.Plug().Write(value)
         except Exception as e:
-            return f'When applying {".".join(node.Path())}: {e}'
-
-    def VisitFixedDict(self, node: MetaTreeFixedDict) -> None:
-        # Some FixedDicts may have custom Plugs
-        if node.Plug() is not None:
-            err: Optional[str] = self.__TryWriteIfNeeded(node, node.Plug())
-            if err is not None:
-                self.__errlist.append(err)
-        # ... otherwise use child plugs elementwise
-        else:
-            if not node.Applyable():
-                raise NotImplemented()
-            
-            for ch in node.Children():
-                node[ch].AcceptVisitor(MetaTreePlugWriterVisitor(self.__diffonly, self.__rawdata[ch], self.__errlist))
+            errlist.append(f'When applying {node.PathStr()}: {e}')
+    return errlist
 
-    def VisitScalar(self, node: MetaTreeScalar) -> None:
-        p = node.Plug()
-        assert(p is not None)
-        self.__TryWriteIfNeeded(node, p)
- 
 # ===[ MODEL AND METAMODEL DEFINITIONS ]===
 # Represents data that has been successfully typechecked against a metamodel
 class TypecheckedModel:
     __rawdata: Any
     __metamodel: 'MetaModel'
+    __slots__ = ('__rawdata', '__metamodel')
 
     def __init__(self, data: Any, metamodel: 'MetaModel'):
         self.__rawdata = data
@@ -467,30 +527,37 @@ class CreateTypecheckedModelResult:
 # ===[ MODEL COMPARISON ]===
 
 class MetaTreeDiffVisitor(MetaTreeVisitor):
-    __left: Any
-    __right: Any
+    # One visitor is used for the whole traversal; the left/right data
+    # belonging to the node currently being visited is the top of __stack
+    __stack: list[tuple[Any, Any]]
     __leftname: str
     __rightname: str
     __difflist: list[str]
+    __slots__ = ('__stack', '__leftname', '__rightname', '__difflist')
 
     def __init__(self, left: Any, right: Any, leftname: str, rightname: str, difflist: list[str]) -> None:
         super().__init__()
-        self.__left = left
-        self.__right = right
+        self.__stack = [(left, right)]
         self.__leftname = leftname
         self.__rightname = rightname
         self.__difflist = difflist
     
     def VisitFixedDict(self, node: MetaTreeFixedDict) -> None:
-        # Assume: self.__left and self.__right have same keys
-        for k in node.Children():
-            node[k].AcceptVisitor(MetaTreeDiffVisitor(self.__left[k], self.__right[k], self.__leftname, 
-                                                      self.__rightname, self.__difflist))
+        # Assume: left and right have same keys
+        stack = self.__stack
+        (left, right) = stack[-1]
+        push = stack.append
+        pop = stack.pop
+        for k, ch in node.Children().items():
+            push((left[k], right[k]))
+            ch.AcceptVisitor(self)
+            pop()
 
     def VisitScalar(self, node: MetaTreeScalar) -> None:
-        # Assume: self.__left and self.__right have same type
-        if self.__left != self.__right:
-            s = f"{node.Name()}: {self.__leftname} = {self.__left} | {self.__rightname} = {self.__right}"
+        # Assume: left and right have same type
+        (left, right) = self.__stack[-1]
+        if left != right:
+            s = f"{node.PathStr()}: {self.__leftname} = {left} | {self.__rightname} = {right}"
             self.__difflist.append(s)
 
 def DiffTypecheckedModels(left: TypecheckedModel, 
@@ -507,16 +574,35 @@ def DiffTypecheckedModels(left: TypecheckedModel,
 # Encapsulate a MetaModel tree within a "MetaModel"
 class MetaModel:
     __root: MetaTreeNode
+    __tree_str: Optional[str] # rendered by the first PrintTree() call
+    __plug_nodes: Optional[list[MetaTreeNode]] # built by the first PlugNodes() call
+    __slots__ = ('__root', '__tree_str', '__plug_nodes')
 
     def __init__(self, root):
         self.__root = root
+        self.__tree_str = None
+        self.__plug_nodes = None
     
     def Root(self) -> MetaTreeNode:
         return self.__root
+
+    # The nodes whose values are read/written through a plug, in tree order.
+    # Reading and applying a config is a plain loop over these, so the tree
+    # is only walked (once) the first time they are needed.
+    def PlugNodes(self) -> list[MetaTreeNode]:
+        if self.__plug_nodes is None:
+            self.__plug_nodes = []
+            self.Root().AcceptVisitor(MetaTreePlugCollectorVisitor(self.__plug_nodes))
+        return self.__plug_nodes
     
     def PrintTree(self, output = sys.stdout):
-        visitor = MetaTreePrinter(output, True, True)
-        self.Root().AcceptVisitor(visitor)
+        # The metamodel never changes once built, so render it only once
+        if self.__tree_str is None:
+            str_io = io.StringIO()
+            visitor = MetaTreePrinter(str_io, True, True)
+            self.Root().AcceptVisitor(visitor)
+            self.__tree_str = str_io.getvalue()
+        output.write(self.__tree_str)
 
     def TypeCheck(self, rawdata) -> list[str]:
         errlist = []
@@ -533,6 +619,76 @@ class MetaModel:
 
 # ===[ META MODEL DEFINITION ]===
 
+# The memory management part of the metamodel, mirroring /sys/kernel/mm.
+# Each entry is either a directory:
+#     (name, helpstring, [entries...], since)
+# or an attribute file:
+#     (name, type, plug class, applyable, since)
+# where `since` is the first kernel version (w, x) providing the entry, or
+# None if it has always been there. Entries appear in the metamodel in the
+# order listed here.
+MM_FS_PATH = pathlib.Path("/sys/kernel/mm")
+MM_SCHEMA = [
+    ("ksm", "kernel samepage merging", [
+        ("max_page_sharing", int, FileIntPlug, True, None),
+        ("merge_across_nodes", int, FileIntPlug, True, None),
+        ("pages_to_scan", int, FileIntPlug, True, None),
+        ("run", int, FileIntPlug, True, None),
+        ("sleep_millisecs", int, FileIntPlug, True, None),
+        ("stable_node_chains_prune_millisecs", int, FileIntPlug, True, None),
+        ("use_zero_pages", int, FileIntPlug, True, None),
+    ], None),
+    ("swap", "", [
+        ("vma_ra_enabled", bool, FileBoolPlug, True, None),
+    ], None),
+    ("transparent_hugepage", "transparent hugepages", [
+        ("khugepaged", "huge pages daemon", [
+            ("alloc_sleep_millisecs", int, FileIntPlug, True, None),
+            ("max_ptes_none", int, FileIntPlug, True, None),
+            # max_ptes_shared introduced in Linux 5.8
+            # (see https://git.kernel.org/pub/scm/linux/kernel/git/stable/linux.git/tree/Documentation/admin-guide/mm/transhuge.rst?h=v5.8 vs 5.7 version)
+            ("max_ptes_shared", int, FileIntPlug, True, (5, 8)),
+            ("max_ptes_swap", int, FileIntPlug, True, None),
+            ("pages_to_scan", int, FileIntPlug, True, None),
+            ("scan_sleep_millisecs", int, FileIntPlug, True, None),
+        ], None),
+        ("defrag", str, ThpOptionPlug, True, None),
+        ("enabled", str, ThpOptionPlug, True, None),
+        ("hpage_pmd_size", int, FileIntPlug, False, None),
+        ("shmem_enabled", str, ThpOptionPlug, True, None),
+        ("use_zero_page", int, FileIntPlug, True, None),
+    ], None),
+    # Assume MGLRU was released in Linux 6.1:
+    # (see https://www.phoronix.com/news/Linux-6.1-rc1-Released)
+    ("lru_gen", "", [
+        ("enabled", str, FileStrPlug, True, None),
+        ("min_ttl_ms", int, FileIntPlug, True, None),
+    ], (6, 1)),
+    # Assume NUMA page demotion released in Linux 5.15
+    # (see https://www.phoronix.com/news/Linux-5.15-Demote-During-Reclai)
+    ("numa", "non-uniform memory access", [
+        ("demotion_enabled", bool, FileBoolPlug, True, None),
+    ], (5, 15)),
+]
+
+# Create the nodes described by `entries` (see MM_SCHEMA) under `parent`,
+# skipping those the running kernel version doesn't have
+def BuildSchemaNodes(entries: list, parent: MetaTreeFixedDict, fspath: pathlib.Path,
+                     kvn: KernelVersionNumber) -> None:
+    for entry in entries:
+        since = entry[-1]
+        if since is not None and (kvn.w, kvn.x) < since:
+            continue
+
+        if isinstance(entry[1], type):
+            (name, ty, plug_class, applyable, _) = entry
+            MetaTreeScalar(name, "", applyable, ty, parent=parent,
+                           plug=plug_class(fspath / name))
+        else:
+            (name, helpstring, children, _) = entry
+            node = MetaTreeFixedDict(name, helpstring, True, parent=parent)
+            BuildSchemaNodes(children, node, fspath / name, kvn)
+
 # Given a kernel version number, generate the MetaModel
 def GenerateMetamodel(kvn: KernelVersionNumber) -> MetaModel:
     # Prepare the tree
@@ -542,93 +698,38 @@ def GenerateMetamodel(kvn: KernelVersionNumber) -> MetaModel:
     MetaTreeKvn("kvn", "kernel version number", parent=node_top)
 
     # Prepare the memory management related configuration options
-    MM_FS_PATH = pathlib.Path("/sys/kernel/mm")
-
-    node_ksm = MetaTreeFixedDict("ksm", "kernel samepage merging", True, parent=node_top)
-    node_swap = MetaTreeFixedDict("swap", "", True, parent=node_top)
-    node_thp = MetaTreeFixedDict("transparent_hugepage", "transparent hugepages", True, parent=node_top)
-    node_khpd = MetaTreeFixedDict("khugepaged", "huge pages daemon", True, parent=node_thp)
-
-    MM_KSM_PATH = MM_FS_PATH / "ksm"
-    MetaTreeScalar("max_page_sharing", "", True, int, parent=node_ksm,
-                   plug=FileIntPlug(MM_KSM_PATH / "max_page_sharing"))
-    MetaTreeScalar("merge_across_nodes", "", True, int, parent=node_ksm,
-                   plug=FileIntPlug(MM_KSM_PATH / "merge_across_nodes"))
-    MetaTreeScalar("pages_to_scan", "", True, int, parent=node_ksm,
-                   plug=FileIntPlug(MM_KSM_PATH / "pages_to_scan"))
-    MetaTreeScalar("run", "", True, int, parent=node_ksm,
-                   plug=FileIntPlug(MM_KSM_PATH / "run"))
-    MetaTreeScalar("sleep_millisecs", "", True, int, parent=node_ksm,
-                   plug=FileIntPlug(MM_KSM_PATH / "sleep_millisecs"))
-    MetaTreeScalar("stable_node_chains_prune_millisecs", "", True, int, parent=node_ksm,
-                   plug=FileIntPlug(MM_KSM_PATH / "stable_node_chains_prune_millisecs"))
-    MetaTreeScalar("use_zero_pages", "", True, int, parent=node_ksm,
-                   plug=FileIntPlug(MM_KSM_PATH / "use_zero_pages"))
-
-    # Assume MGLRU was released in Linux 6.1:
-    # (see https://www.phoronix.com/news/Linux-6.1-rc1-Released)
-    if kvn.w > 6 or (kvn.w == 6 and kvn.x >= 1):
-        node_lru_gen = MetaTreeFixedDict("lru_gen", "", True, parent=node_top)
-        MM_LRU_GEN_PATH = MM_FS_PATH / "lru_gen"
-        MetaTreeScalar("enabled", "", True, str, parent=node_lru_gen,
-                       plug=FileStrPlug(MM_LRU_GEN_PATH / "enabled"))
-        MetaTreeScalar("min_ttl_ms", "", True, int, parent=node_lru_gen,
-                       plug=FileIntPlug(MM_LRU_GEN_PATH / "min_ttl_ms"))
-    
-    # Assume NUMA page demotion released in Linux 5.15
-    # (see https://www.phoronix.com/news/Linux-5.15-Demote-During-Reclai)
-    if kvn.w > 5 or (kvn.w == 5 and kvn.x >= 15):    
-        node_numa = MetaTreeFixedDict("numa", "non-uniform memory access", True, parent = node_top)
-        MM_NUMA_PATH = MM_FS_PATH / "numa"
-        MetaTreeScalar("demotion_enabled", "", True, bool, parent=node_numa,
-                    plug=FileBoolPlug(MM_NUMA_PATH / "demotion_enabled"))
-
-    MM_SWAP_PATH = MM_FS_PATH / "swap"
-    MetaTreeScalar("vma_ra_enabled", "", True, bool, parent=node_swap,
-                   plug=FileBoolPlug(MM_SWAP_PATH / "vma_ra_enabled"))
-
-    MM_THP_PATH = MM_FS_PATH / "transparent_hugepage"
-    MetaTreeScalar("defrag", "", True, str, parent=node_thp,
-                   plug=ThpOptionPlug(MM_THP_PATH / "defrag"))
-    MetaTreeScalar("enabled", "", True, str, parent=node_thp,
-                   plug=ThpOptionPlug(MM_THP_PATH / "enabled"))
-    MetaTreeScalar("hpage_pmd_size", "", False, int, parent=node_thp,
-                   plug=FileIntPlug(MM_THP_PATH / "hpage_pmd_size"))
-    MetaTreeScalar("shmem_enabled", "", True, str, parent=node_thp,
-                   plug=ThpOptionPlug(MM_THP_PATH / "shmem_enabled"))
-    MetaTreeScalar("use_zero_page", "", True, int, parent=node_thp,
-                   plug=FileIntPlug(MM_THP_PATH / "use_zero_page"))
-
-    MM_THP_KHPD_PATH = MM_THP_PATH / "khugepaged"
-    MetaTreeScalar("alloc_sleep_millisecs", "", True, int, parent=node_khpd,
-                   plug=FileIntPlug(MM_THP_KHPD_PATH / "alloc_sleep_millisecs"))
-    MetaTreeScalar("max_ptes_none", "", True, int, parent=node_khpd,
-                   plug=FileIntPlug(MM_THP_KHPD_PATH / "max_ptes_none"))
-    # max_ptes_shared introduced in Linux 5.8
-    # (see https://git.kernel.org/pub/scm/linux/kernel/git/stable/linux.git/tree/Documentation/admin-guide/mm/transhuge.rst?h=v5.8 vs 5.7 version)
-    if kvn.w > 5 or (kvn.w == 5 and kvn.x >= 8):    
-        MetaTreeScalar("max_ptes_shared", "", True, int, parent=node_khpd,
-                    plug=FileIntPlug(MM_THP_KHPD_PATH / "max_ptes_shared"))
-    MetaTreeScalar("max_ptes_swap", "", True, int, parent=node_khpd,
-                   plug=FileIntPlug(MM_THP_KHPD_PATH / "max_ptes_swap"))
-    MetaTreeScalar("pages_to_scan", "", True, int, parent=node_khpd,
-                   plug=FileIntPlug(MM_THP_KHPD_PATH / "pages_to_scan"))
-    MetaTreeScalar("scan_sleep_millisecs", "", True, int, parent=node_khpd,
-                   plug=FileIntPlug(MM_THP_KHPD_PATH / "scan_sleep_millisecs"))
+    BuildSchemaNodes(MM_SCHEMA, node_top, MM_FS_PATH, kvn)
 
     return MetaModel(node_top)
 
 # Get the metamodel for the current system
+# Built once per process; the metamodel is not modified after construction
+@functools.lru_cache(maxsize=1)
 def SystemMetamodel() -> MetaModel:
-    version_str = platform.uname().release
-    kvn = KernelVersionNumber(version_str)
-    return GenerateMetamodel(kvn)
+    return GenerateMetamodel(GetKernelVersion())
+
+def ReadSystemConfig(metamodel: MetaModel, jobs: int = 1) -> TypecheckedModel:
+    nodes = metamodel.PlugNodes()
+    values = ReadPlugs([n.Plug() for n in nodes], jobs)
 
-def ReadSystemConfig(metamodel: MetaModel) -> TypecheckedModel:
+    # Rebuild the raw data tree from the plug values. Each FixedDict's data
+    # dict is created once, the first time one of its descendants needs it;
+    # the root's dict is the raw data itself.
     rawdata = {}
-    reader = MetaTreePlugReaderVisitor(rawdata)
-    metamodel.Root().AcceptVisitor(reader)
-    result = metamodel.CreateTypecheckedModel(rawdata["top"])
+    dicts: dict[MetaTreeNode, dict] = {metamodel.Root(): rawdata}
+
+    def DictFor(node: MetaTreeNode) -> dict:
+        d = dicts.get(node)
+        if d is None:
+            d = {}
+            DictFor(node.Parent())[node.Name()] = d
+            dicts[node] = d
+        return d
+
+    for node, value in zip(nodes, values):
+        DictFor(node.Parent())[node.Name()] = value
+
+    result = metamodel.CreateTypecheckedModel(rawdata)
     if result.success:
         assert(result.model is not None)
         return result.model
@@ -639,14 +740,53 @@ def ApplySystemConfig(model: TypecheckedModel, diffonly: bool) -> list[str]:
     # Returns list of errors (empty if none)
     metamodel = model.MetaModel()
     rawdata = model.RawData()
+    nodes = metamodel.PlugNodes()
+
+    desired = []
+    for node in nodes:
+        # The root is not part of the raw data, hence the Path()[1:]
+        value = rawdata
+        for k in node.Path()[1:]:
+            value = value[k]
+        desired.append(value)
+
+    # Phase 1: read the current value of every setting that has to be
+    # compared first: all of them if diffonly, otherwise only the
+    # non-applyable ones (which are verified, never written)
+    compared = [i for i, node in enumerate(nodes) if diffonly or not node.Applyable()]
+    current = dict(zip(compared, ReadPlugs([nodes[i].Plug() for i in compared])))
+
+    # Phase 2: decide what needs writing
     errlist = []
-    writer = MetaTreePlugWriterVisitor(diffonly, rawdata, errlist)
-    metamodel.Root().AcceptVisitor(writer)
+    writes = []
+    for i, node in enumerate(nodes):
+        if i in current and current[i] == desired[i]:
+            continue
+        if not node.Applyable():
+            errlist.append(f'{node.PathStr()}: difference in non-applyable value (desired = {desired[i]} actual = {current[i]})')
+        else:
+            writes.append((node, desired[i]))
+
+    # Phase 3: write
+    errlist += WritePlugs(writes)
     return errlist
 
+def LoadYaml(file: IO) -> Any:
+    # yaml is imported here rather than at module level so that commands
+    # which never touch a config file (info, --help, ...) don't pay for it
+    import yaml
+    # Prefer the libyaml-backed loader when PyYAML was built with it
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    return yaml.load(file, Loader=loader)
+
+def DumpYaml(data: Any, file: IO) -> None:
+    import yaml # see LoadYaml
+    dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+    yaml.dump(data, file, Dumper=dumper)
+
 def LoadAndCheckConfigFile(filename: pathlib.Path) -> TypecheckedModel:
     with open(filename, 'r') as file:
-        rawdata = yaml.safe_load(file)
+        rawdata = LoadYaml(file)
     
     typecheck_results = SystemMetamodel().CreateTypecheckedModel(rawdata)
 
@@ -661,7 +801,6 @@ def LoadAndCheckConfigFile(filename: pathlib.Path) -> TypecheckedModel:
 
 # ===[ USER PROCESSING ]===
 import argparse
-import yaml
 
 class Subcommand(ABC):
     __name: str
@@ -691,6 +830,11 @@ class Subcommand(ABC):
     def Go(self, args):
         pass
 
+# Option shared by the subcommands that read the system configuration
+def AddJobsArgument(parser: argparse.ArgumentParser):
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of system settings to read in parallel (default: 1)")
+
 class InfoSubcommand(Subcommand):
     def __init__(self):
         super().__init__("info", "display info about metamodel",
@@ -728,11 +872,12 @@ class ObtainSubcommand(Subcommand):
     
     def SetupParser(self, parser: argparse.ArgumentParser):
         parser.add_argument("filename", type=pathlib.Path, help="save config to this file")
+        AddJobsArgument(parser)
     
     def Go(self, args):
-        sysconfig = ReadSystemConfig(SystemMetamodel())
+        sysconfig = ReadSystemConfig(SystemMetamodel(), args.jobs)
         with open(args.filename, "w") as file:
-            yaml.safe_dump(sysconfig.RawData(), file)
+            DumpYaml(sysconfig.RawData(), file)
 
 class ApplySubcommand(Subcommand):
     def __init__(self):
@@ -764,10 +909,11 @@ class VerifySubcommand(Subcommand):
     
     def SetupParser(self, parser: argparse.ArgumentParser):
         parser.add_argument("filename", type=pathlib.Path, help="config to verify against")
+        AddJobsArgument(parser)
 
     def Go(self, args):
         model = LoadAndCheckConfigFile(args.filename)
-        sysconfig = ReadSystemConfig(SystemMetamodel())
+        sysconfig = ReadSystemConfig(SystemMetamodel(), args.jobs)
         difflist = DiffTypecheckedModels(model, sysconfig, "file", "system")
         if not difflist:
             print("Verify OK.")
@@ -1,6 +1,8 @@
 #!/usr/bin/python3
 
 import io
+import pathlib
+import tempfile
 import unittest
 
 from src.cf2 import *
@@ -42,6 +44,13 @@ BAD_RAW_DATA = {
             }
 
 # ===[ Tests ]===
+class TestPrefixLines(unittest.TestCase):
+    def test_prefix_lines(self):
+        self.assertEqual(PrefixLines("", "> "), "")
+        self.assertEqual(PrefixLines("a", "> "), "> a")
+        self.assertEqual(PrefixLines("a\nb", "> "), "> a\n> b")
+        self.assertEqual(PrefixLines("a\n\nb\n", "> "), "> a\n> \n> b\n")
+
 class TestTypeCheck(unittest.TestCase):
     def test_good_data(self):
         errlist = TEST_METAMODEL.TypeCheck(GOOD_RAW_DATA)
@@ -57,6 +66,18 @@ top.baz: missing "name" field [Type = str]
 top.teams: type mismatch (expected: dict got: int)
 top: "etc" is not a valid key""")
 
+class TestPath(unittest.TestCase):
+    def test_path(self):
+        self.assertEqual(TOP.Path(), ("top",))
+        self.assertEqual(BAZ["age"].Path(), ("top", "baz", "age"))
+        self.assertEqual(BAZ["age"].PathStr(), "top.baz.age")
+
+    def test_duplicate_child(self):
+        top = MetaTreeFixedDict("top", "", True)
+        MetaTreeScalar("a", "", True, int, parent=top)
+        with self.assertRaises(ValueError):
+            MetaTreeScalar("a", "", True, str, parent=top)
+
 class TestCreateTypecheckedModel(unittest.TestCase):
     def test_good_data(self):
         result = TEST_METAMODEL.CreateTypecheckedModel(GOOD_RAW_DATA)
@@ -70,6 +91,25 @@ class TestCreateTypecheckedModel(unittest.TestCase):
         self.assertNotEqual(result.errors, [])
         self.assertIsNone(result.model)
 
+class TestDiff(unittest.TestCase):
+    def test_diff(self):
+        other_raw_data = {
+                "bar": 6,
+                "baz": {
+                    "name": "john",
+                    "age": 38,
+                },
+                "teams" : {
+                    "soccer": "man utd",
+                    "nfl": "tigers",
+                }
+            }
+        left = TEST_METAMODEL.CreateTypecheckedModel(GOOD_RAW_DATA).model
+        right = TEST_METAMODEL.CreateTypecheckedModel(other_raw_data).model
+        self.assertEqual(DiffTypecheckedModels(left, left, "l", "r"), [])
+        self.assertEqual(DiffTypecheckedModels(left, right, "l", "r"),
+                         ["top.bar: l = 5 | r = 6", "top.baz.age: l = 37 | r = 38"])
+
 class TestPrintTree(unittest.TestCase):
     def test_print_tree(self):
         strio = io.StringIO()
@@ -87,6 +127,66 @@ top: i am top [Ap]
 """
         self.assertEqual(s, expected)
 
+    def test_print_tree_twice(self):
+        first = io.StringIO()
+        second = io.StringIO()
+        TEST_METAMODEL.PrintTree(first)
+        TEST_METAMODEL.PrintTree(second)
+        self.assertEqual(first.getvalue(), second.getvalue())
+
+# Metamodel whose plugs are backed by files in directory d
+def MakeFileMetamodel(d: pathlib.Path) -> MetaModel:
+    (d / "run").write_text("1\n")
+    (d / "size").write_text("4096\n")
+    (d / "enabled").write_text("always madvise [never]\n")
+    (d / "mode").write_text("fast\n")
+
+    top = MetaTreeFixedDict("top", "", True)
+    MetaTreeScalar("run", "", True, int, parent=top, plug=FileIntPlug(d / "run"))
+    MetaTreeScalar("size", "", False, int, parent=top, plug=FileIntPlug(d / "size"))
+    sub = MetaTreeFixedDict("sub", "", True, parent=top)
+    MetaTreeScalar("enabled", "", True, str, parent=sub, plug=ThpOptionPlug(d / "enabled"))
+    MetaTreeScalar("mode", "", True, str, parent=sub, plug=FileStrPlug(d / "mode"))
+    return MetaModel(top)
+
+class TestReadSystemConfig(unittest.TestCase):
+    def test_read(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            model = ReadSystemConfig(MakeFileMetamodel(pathlib.Path(tmpdir)))
+            self.assertEqual(model.RawData(),
+                             {"run": 1, "size": 4096, "sub": {"enabled": "never", "mode": "fast"}})
+
+    def test_read_parallel(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            metamodel = MakeFileMetamodel(pathlib.Path(tmpdir))
+            self.assertEqual(ReadSystemConfig(metamodel, jobs=4).RawData(),
+                             ReadSystemConfig(metamodel).RawData())
+
+class TestApplySystemConfig(unittest.TestCase):
+    def test_apply(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            d = pathlib.Path(tmpdir)
+            metamodel = MakeFileMetamodel(d)
+            desired = {"run": 0, "size": 4096, "sub": {"enabled": "never", "mode": "slow"}}
+            model = metamodel.CreateTypecheckedModel(desired).model
+            self.assertEqual(ApplySystemConfig(model, True), [])
+            self.assertEqual((d / "run").read_text(), "0")
+            self.assertEqual((d / "mode").read_text(), "slow")
+            # Unchanged values are left alone when only applying differences
+            self.assertEqual((d / "enabled").read_text(), "always madvise [never]\n")
+
+    def test_apply_errors(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            d = pathlib.Path(tmpdir)
+            metamodel = MakeFileMetamodel(d)
+            (d / "mode").unlink()
+            desired = {"run": 1, "size": 8192, "sub": {"enabled": "never", "mode": "slow"}}
+            model = metamodel.CreateTypecheckedModel(desired).model
+            errlist = ApplySystemConfig(model, False)
+            self.assertEqual(len(errlist), 2)
+            self.assertEqual(errlist[0], "top.size: difference in non-applyable value (desired = 8192 actual = 4096)")
+            self.assertTrue(errlist[1].startswith("When applying top.sub.mode: "))
+
 # ===[ Boilerplate ]===
 if __name__ == '__main__':
     unittest.main()